@@ -1,13 +1,20 @@
 """FastAPI Users Firebase Plugin.
 
 This is the entrypoint of a plugin to interact with Firebase Authentication from FastAPI users plugin.
+
+The public names are imported lazily on first access, so importing the package does not load Firebase Admin until it
+is actually used.
 """
 
-from .id_token import FirebaseIdTokenStrategy
-from .manager import FirebaseUserManager
-from .schemas import CreateFirebaseUserModel, CreateUpdateFirebaseUserModel, UpdateFirebaseUserModel
-from .user import FirebaseUser
-from .user_database import FirebaseUserDatabase
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from .id_token import FirebaseIdTokenStrategy
+    from .manager import FirebaseUserManager
+    from .schemas import CreateFirebaseUserModel, CreateUpdateFirebaseUserModel, UpdateFirebaseUserModel
+    from .user import FirebaseUser
+    from .user_database import FirebaseUserDatabase, get_user_database
 
 __all__ = [
     "FirebaseUser",
@@ -17,4 +24,30 @@ __all__ = [
     "UpdateFirebaseUserModel",
     "FirebaseUserManager",
     "FirebaseIdTokenStrategy",
+    "get_user_database",
 ]
+
+_EXPORTS = {
+    "FirebaseUser": ".user",
+    "FirebaseUserDatabase": ".user_database",
+    "CreateFirebaseUserModel": ".schemas",
+    "CreateUpdateFirebaseUserModel": ".schemas",
+    "UpdateFirebaseUserModel": ".schemas",
+    "FirebaseUserManager": ".manager",
+    "FirebaseIdTokenStrategy": ".id_token",
+    "get_user_database": ".user_database",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        error_msg = f"module {__name__!r} has no attribute {name!r}"
+        raise AttributeError(error_msg)
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted({*globals(), *__all__})
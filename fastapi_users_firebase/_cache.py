@@ -0,0 +1,130 @@
+"""Caching helpers.
+
+This module contains small in-memory caching primitives used to avoid repeated calls to Firebase.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar, cast
+
+import anyio
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """A bounded mapping whose entries expire after a time-to-live.
+
+    When the cache is full, the least recently used entry is evicted.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        """Initialyze an empty cache.
+
+        Args:
+            maxsize: The maximum number of entries to keep.
+            ttl: The default time-to-live of an entry, in seconds.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[K, Tuple[float, V]] = OrderedDict()
+
+    def get(self, key: K) -> Optional[V]:
+        """Retrieve a value from the cache.
+
+        Args:
+            key: The key to look up
+
+        Returns:
+            The cached value, or `None` if it is missing or expired.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        """Store a value in the cache.
+
+        Args:
+            key: The key to store the value under
+            value: The value to store
+            ttl: A time-to-live overriding the default one, if shorter. Defaults to None.
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> None:
+        """Remove a value from the cache, if present.
+
+        Args:
+            key: The key to remove
+        """
+        self._data.pop(key, None)
+
+
+class _Call(Generic[V]):
+    def __init__(self) -> None:
+        self.event = anyio.Event()
+        self.done = False
+        self.result: Optional[V] = None
+        self.error: Optional[Exception] = None
+
+
+class InflightCalls(Generic[K, V]):
+    """Coalesce concurrent calls sharing the same key.
+
+    While a call for a key is running, other callers with the same key wait for it and get its outcome instead of
+    issuing their own.
+    """
+
+    def __init__(self) -> None:
+        """Initialyze the in-flight call registry."""
+        self._calls: Dict[K, _Call[V]] = {}
+
+    async def run(self, key: K, func: Callable[[], Awaitable[V]]) -> V:
+        """Run `func`, or wait for an already running call with the same key.
+
+        Args:
+            key: The key identifying the call
+            func: A coroutine function producing the value
+
+        Returns:
+            The value produced by `func`.
+        """
+        call = self._calls.get(key)
+        while call is not None:
+            await call.event.wait()
+            if call.done:
+                if call.error is not None:
+                    raise call.error
+                return cast(V, call.result)
+            # The running call was cancelled, so try again.
+            call = self._calls.get(key)
+
+        call = self._calls[key] = _Call()
+        try:
+            call.result = await func()
+        except Exception as exc:
+            call.error = exc
+            call.done = True
+            raise
+        else:
+            call.done = True
+            return cast(V, call.result)
+        finally:
+            del self._calls[key]
+            call.event.set()
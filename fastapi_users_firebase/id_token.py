@@ -1,16 +1,21 @@
 """The ID token processing strategy."""
 
+import hashlib
+import time
+from functools import partial
 from http import HTTPStatus
 from typing import Any, Dict, Optional
 
 import firebase_admin
-from anyio import to_thread
+from anyio import CapacityLimiter, to_thread
 from fastapi import HTTPException
 from fastapi_users import BaseUserManager
 from fastapi_users.authentication.strategy import Strategy
 from firebase_admin import auth
 
+from fastapi_users_firebase._cache import InflightCalls, TTLCache
 from fastapi_users_firebase.user import UID, FirebaseUser
+from fastapi_users_firebase.user_database import FirebaseUserDatabase
 
 
 class FirebaseIdTokenStrategy(Strategy[FirebaseUser, UID]):
@@ -20,34 +25,106 @@ class FirebaseIdTokenStrategy(Strategy[FirebaseUser, UID]):
     """
 
     def __init__(
-        self, app: Optional[firebase_admin.App] = None, developer_claims: Optional[Dict[str, Any]] = None
+        self,
+        app: Optional[firebase_admin.App] = None,
+        developer_claims: Optional[Dict[str, Any]] = None,
+        cache_ttl: float = 0,
+        cache_max: int = 10000,
+        refresh_user: bool = False,
+        check_revoked: bool = True,
+        limiter: Optional[CapacityLimiter] = None,
     ) -> None:
         """Initialyze a new token strategy object.
 
+        Verified tokens may be cached for at most `cache_ttl` seconds and never past their own expiration time. A
+        revoked token, or the token of a disabled user, may thus be accepted until its cache entry expires, so caching
+        is disabled by default and every token is verified against Firebase.
+
+        The cache, and the sharing of concurrent verifications of the same token, belong to the strategy object. The
+        `get_strategy` dependency of the authentication backend runs on every request, so it must return a long-lived
+        strategy for them to have any effect:
+
+        ```python
+        strategy = FirebaseIdTokenStrategy(firebase_app, cache_ttl=30)
+
+        def get_strategy():
+            return strategy
+        ```
+
+        When the user manager is backed by a `FirebaseUserDatabase`, the user is built from the token claims instead of
+        being fetched again from Firebase. Set `refresh_user` to always fetch the full user record.
+
+        Checking whether a token was revoked, or its user disabled, takes a call to Firebase. With `check_revoked`
+        disabled, tokens are verified locally, and stay valid until they expire. The user is then always fetched from
+        Firebase, since the token claims do not tell whether it was disabled.
+
+        Token verification runs in a worker thread. Pass the `limiter` given to `FirebaseUserDatabase` to bound all
+        calls to Firebase together.
+
         Args:
             app: The firebase app to use.
             developer_claims: Custom claims to attach to the custom tokens
+            cache_ttl: How long to cache the claims of a verified token, in seconds. Defaults to 0.
+            cache_max: The maximum number of verified tokens to cache. Defaults to 10000.
+            refresh_user: Whether to fetch the user record instead of building it from the token. Defaults to False.
+            check_revoked: Whether to check if the token was revoked or the user disabled. Defaults to True.
+            limiter: The capacity limiter bounding the worker threads. Defaults to None.
         """
         super().__init__()
         self._app = app
         self._developer_claims = developer_claims
+        self._cache: TTLCache[bytes, Dict[str, Any]] = TTLCache(cache_max, cache_ttl)
+        self._inflight: InflightCalls[bytes, Dict[str, Any]] = InflightCalls()
+        self._refresh_user = refresh_user
+        self._check_revoked = check_revoked
+        self._limiter = limiter
 
     async def read_token(  # noqa: D102
         self, token: Optional[str], user_manager: BaseUserManager[FirebaseUser, UID]
     ) -> Optional[FirebaseUser]:
         if token is None:
             return None
-        try:
-            data = await to_thread.run_sync(auth.verify_id_token, token, self._app, True)
-        except (auth.RevokedIdTokenError, auth.ExpiredIdTokenError) as exc:
-            raise HTTPException(HTTPStatus.FORBIDDEN, str(exc)) from exc
-        except auth.InvalidIdTokenError:
-            return None
+        key = hashlib.sha256(token.encode()).digest()
+        data = self._cache.get(key)
+        if data is None:
+            try:
+                data = await self._inflight.run(key, partial(self._verify, token, key))
+            except (auth.RevokedIdTokenError, auth.ExpiredIdTokenError) as exc:
+                raise HTTPException(HTTPStatus.FORBIDDEN, str(exc)) from exc
+            except auth.InvalidIdTokenError:
+                return None
+
+        user_db = getattr(user_manager, "user_db", None)
+        # Without the revocation check, nothing tells whether the user was disabled since the token was issued.
+        if self._refresh_user or not self._check_revoked or not isinstance(user_db, FirebaseUserDatabase):
+            return await user_manager.get(user_manager.parse_id(data["uid"]))
+        return user_db.user_from_claims(data)
 
-        return await user_manager.get(user_manager.parse_id(data["uid"]))
+    async def _verify(self, token: str, key: bytes) -> Dict[str, Any]:
+        data = await to_thread.run_sync(
+            auth.verify_id_token, token, self._app, self._check_revoked, limiter=self._limiter
+        )
+        self._cache.set(key, data, data["exp"] - time.time())
+        return data
+
+    async def warmup(self) -> None:
+        """Fetch the public keys used to verify ID tokens ahead of time.
+
+        Firebase Admin downloads these keys on the first verification and again whenever they expire, which delays
+        that request. Call this on application startup, and optionally again periodically, so requests find them
+        cached.
+        """
+        await to_thread.run_sync(_fetch_id_token_certs, self._app, limiter=self._limiter)
 
     async def write_token(self, user: FirebaseUser) -> str:  # noqa: D102 # pragma: nocover
         raise NotImplementedError()
 
     async def destroy_token(self, token: str, user: FirebaseUser) -> None:  # noqa: D102 # pragma: nocover
         raise NotImplementedError()
+
+
+def _fetch_id_token_certs(app: Optional[firebase_admin.App]) -> None:
+    # Firebase Admin does not expose its key cache, so this relies on its internals. The request goes through the
+    # same cache-control aware session used to verify tokens, which keeps the keys until they expire.
+    verifier = auth._get_client(app)._token_verifier
+    verifier.request(verifier.id_token_verifier.cert_url, method="GET")
@@ -11,7 +11,7 @@ from fastapi_users.manager import BaseUserManager
 from fastapi_users.schemas import BaseUserCreate, BaseUserUpdate
 
 from fastapi_users_firebase.user import UID, FirebaseUser
-from fastapi_users_firebase.user_database import FirebaseUserDatabase
+from fastapi_users_firebase.user_database import FirebaseUserDatabase, get_user_database
 
 
 class FirebaseUserManager(BaseUserManager[FirebaseUser, UID]):  # pragma: nocover
@@ -26,18 +26,21 @@ class FirebaseUserManager(BaseUserManager[FirebaseUser, UID]):  # pragma: nocove
 
         This is a specialyzed user manger for firebase authentication. It does some operations different than default implementation.
 
+        When no user database is given, the shared one from `get_user_database` is used, with its default options. To
+        enable caching or other database options, pass `get_user_database(app, ...)` instead.
+
         Args:
             user_db: The user database object
             app: A Firebase app. Defaults to None.
         """
-        user_db = user_db or FirebaseUserDatabase(app or firebase_admin.get_app())
+        user_db = user_db or get_user_database(app or firebase_admin.get_app())
         super().__init__(user_db)
         self._app = user_db._app
 
     def parse_id(self, value: Any) -> UID:
         """Parse the ID value.
 
-        This just returns an string wrapped for typing purposes.
+        This just returns an string wrapped for typing purposes, non-string values are converted first.
 
         Args:
             value: the value to be parsed
@@ -45,7 +48,7 @@ class FirebaseUserManager(BaseUserManager[FirebaseUser, UID]):  # pragma: nocove
         Returns:
             The parsed user ID
         """
-        return UID(str(value))
+        return UID(value if isinstance(value, str) else str(value))
 
     async def create(
         self, user_create: BaseUserCreate, safe: bool = False, request: Optional[Request] = None
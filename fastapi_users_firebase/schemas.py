@@ -1,11 +1,24 @@
 """Schemas module."""
 
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, Optional
 
 from fastapi_users.schemas import BaseUserCreate, BaseUserUpdate, CreateUpdateDictModel
-from pydantic import HttpUrl, Json, model_validator
+from pydantic import BeforeValidator, HttpUrl, TypeAdapter
 from pydantic_extra_types.phone_numbers import PhoneNumber
-from typing_extensions import Self
+from typing_extensions import Annotated
+
+_JSON_OBJECT = TypeAdapter(Dict[str, Any])
+
+
+def _parse_json(value: Any) -> Any:
+    # pydantic parses JSON natively, which is faster than the standard library.
+    if isinstance(value, (str, bytes)):
+        return _JSON_OBJECT.validate_json(value)
+    return value
+
+
+JsonDict = Annotated[Dict[str, Any], BeforeValidator(_parse_json)]
+"""A JSON object, given either as a dict or as a JSON string."""
 
 
 class CreateUpdateFirebaseUserModel(CreateUpdateDictModel):
@@ -13,22 +26,18 @@ class CreateUpdateFirebaseUserModel(CreateUpdateDictModel):
 
     phone_number: Optional[PhoneNumber] = None
     display_name: Optional[str] = None
-    photo_url: Optional[HttpUrl]
+    photo_url: Optional[HttpUrl] = None
     custom_claims: Optional[Dict[str, Any]] = None
 
 
 class CreateFirebaseUserModel(BaseUserCreate, CreateUpdateFirebaseUserModel):
     """Schema to create an user."""
 
-    @model_validator(mode="after")
-    def _check_data(self) -> Self:
-        if self.email is None and self.phone_number is None:  # pragma: nocover
-            error_msg = "Either email or phone number must be set."
-            raise ValueError(error_msg)
-        return self
-
 
 class UpdateFirebaseUserModel(BaseUserUpdate, CreateUpdateFirebaseUserModel):
-    """A pydantic schema to update an existing user."""
+    """A pydantic schema to update an existing user.
+
+    Custom claims may also be given as a JSON object string.
+    """
 
-    custom_claims: Union[Json, Dict[str, Any], None] = None
+    custom_claims: Optional[JsonDict] = None
@@ -1,7 +1,9 @@
 """The user object wrapper."""
 
+import json
+import warnings
 from dataclasses import dataclass
-from typing import Callable, NewType, Optional
+from typing import Any, Callable, Dict, NewType, Optional
 
 import firebase_admin
 from fastapi_users.models import UserProtocol
@@ -11,6 +13,36 @@ from typing_extensions import Self
 IsSuperuser = Callable[[auth.UserRecord], bool]
 UID = NewType("UID", str)
 
+# The fields exposed by `FirebaseUser.to_dict`.
+_PUBLIC_FIELDS = ("id", "email", "is_active", "is_verified", "is_superuser", "phone_number", "name")
+
+# Claims set by Firebase on every ID token, anything else is a custom claim.
+_ID_TOKEN_CLAIMS = frozenset({
+    "acr",
+    "amr",
+    "at_hash",
+    "aud",
+    "auth_time",
+    "azp",
+    "c_hash",
+    "cnf",
+    "email",
+    "email_verified",
+    "exp",
+    "firebase",
+    "iat",
+    "iss",
+    "jti",
+    "name",
+    "nbf",
+    "nonce",
+    "phone_number",
+    "picture",
+    "sub",
+    "uid",
+    "user_id",
+})
+
 
 @dataclass(frozen=True)
 class FirebaseUser(UserProtocol[UID]):
@@ -23,9 +55,20 @@ class FirebaseUser(UserProtocol[UID]):
     is_superuser: bool
     phone_number: Optional[str]
     name: Optional[str]
+    # Firebase never exposes password hashes, so this is always empty.
     hashed_password: str
     record: auth.UserRecord
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the public fields of the user as a dict.
+
+        This is cheaper than `dataclasses.asdict`, and leaves out the password hash and the firebase user record.
+
+        Returns:
+            A dict mapping field names to their values.
+        """
+        return {name: getattr(self, name) for name in _PUBLIC_FIELDS}
+
     @classmethod
     def from_record(
         cls,
@@ -39,17 +82,61 @@ class FirebaseUser(UserProtocol[UID]):
 
         Args:
             user: A firebase user object
-            app: a firebase app, if any. Defaults to None.
+            app: Deprecated, the app is not used. Defaults to None.
             is_superuser_func: A function to determine whether the user is a superuser. Defaults to None.
         """
+        if app is not None:
+            _warn_app_deprecated()
+        phone_number = user.phone_number
         return cls(
-            email=str(user.email or ""),
+            email=user.email or "",
             id=UID(str(user.uid)),
             is_active=not user.disabled,
-            is_verified=user.email_verified or bool(user.phone_number),
-            phone_number=user.phone_number,
+            is_verified=bool(user.email_verified) or bool(phone_number),
+            phone_number=phone_number,
             name=user.display_name,
             is_superuser=is_superuser_func(user) if is_superuser_func is not None else False,
             hashed_password="",
             record=user,
         )
+
+    @classmethod
+    def from_claims(
+        cls,
+        claims: Dict[str, Any],
+        app: Optional[firebase_admin.App] = None,
+        is_superuser_func: Optional[IsSuperuser] = None,
+    ) -> Self:
+        """Build an user object from the claims of a verified ID token.
+
+        This avoids fetching the user record from Firebase. The record is rebuilt from the token claims, so it only
+        carries the profile fields and custom claims included in the token.
+
+        Args:
+            claims: The decoded claims of a verified ID token
+            app: Deprecated, the app is not used. Defaults to None.
+            is_superuser_func: A function to determine whether the user is a superuser. Defaults to None.
+        """
+        if app is not None:
+            _warn_app_deprecated()
+        custom_claims = {key: value for key, value in claims.items() if key not in _ID_TOKEN_CLAIMS}
+        record = auth.UserRecord({
+            "localId": claims["uid"],
+            "email": claims.get("email"),
+            "emailVerified": claims.get("email_verified", False),
+            "phoneNumber": claims.get("phone_number"),
+            "displayName": claims.get("name"),
+            "photoUrl": claims.get("picture"),
+            "disabled": False,
+            "customAttributes": json.dumps(custom_claims) if custom_claims else None,
+        })
+        return cls.from_record(record, is_superuser_func=is_superuser_func)
+
+
+def _warn_app_deprecated() -> None:
+    # Two levels up is the caller of `from_record` or `from_claims`.
+    warnings.warn(
+        "The app argument of FirebaseUser constructors is not used and will be removed.",
+        DeprecationWarning,
+        stacklevel=3,
+    )
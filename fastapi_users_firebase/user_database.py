@@ -5,35 +5,88 @@ This module contains the user database store.
 
 from __future__ import annotations
 
-from typing import Any, Dict, Optional, Union, cast
+import operator
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar, Union
 
 import firebase_admin
-from anyio import to_thread
+from anyio import CapacityLimiter, to_thread
 from fastapi_users.db.base import BaseUserDatabase
 from firebase_admin import auth
 
+from fastapi_users_firebase._cache import InflightCalls, TTLCache
 from fastapi_users_firebase.schemas import (
     CreateFirebaseUserModel,
     UpdateFirebaseUserModel,
 )
 from fastapi_users_firebase.user import UID, FirebaseUser, IsSuperuser
 
+T = TypeVar("T")
+
+# The maximum number of identifiers accepted by `auth.get_users`.
+_GET_USERS_BATCH_SIZE = 100
+
+# The firebase user arguments, the schema attributes they are read from and how to convert them, if needed.
+_FIELD_MAP: Tuple[Tuple[str, str, Optional[Callable[[Any], Any]]], ...] = (
+    ("email", "email", None),
+    ("password", "password", None),
+    ("email_verified", "is_verified", None),
+    ("disabled", "is_active", operator.not_),
+    ("display_name", "display_name", None),
+    ("phone_number", "phone_number", None),
+    ("photo_url", "photo_url", str),
+    ("custom_claims", "custom_claims", None),
+)
+
+# The databases returned by `get_user_database`, keyed by app name and options. Apps are looked up by name rather than
+# held as keys, so databases of deleted apps can be dropped.
+_user_databases: Dict[Tuple[Any, ...], FirebaseUserDatabase] = {}
+
 
 class FirebaseUserDatabase(BaseUserDatabase[FirebaseUser, UID]):
     """A database of firebase users."""
 
     def __init__(
-        self, firebase_app: Optional[firebase_admin.App] = None, is_superuser_func: Optional[IsSuperuser] = None
+        self,
+        firebase_app: Optional[firebase_admin.App] = None,
+        is_superuser_func: Optional[IsSuperuser] = None,
+        pool_maxsize: Optional[int] = None,
+        limiter: Optional[CapacityLimiter] = None,
+        cache_ttl: float = 0,
+        cache_max: int = 10000,
     ) -> None:
         """Initialyze the firebase user store.
 
+        Firebase Admin keeps at most 10 open connections per app to the authentication service, so when more calls
+        run concurrently, extra connections are closed after each call. Set `pool_maxsize` to the expected number of
+        concurrent calls to keep them open. This requires the firebase app to be initialized.
+
+        Firebase Admin is synchronous, so each call runs in a worker thread. By default, these threads are bounded by
+        the anyio default limiter, shared with the rest of the application. Pass a dedicated `limiter` to size the
+        number of concurrent Firebase calls independently.
+
+        Concurrent lookups of the same user ID or email share a single Firebase call. Found users may also be cached
+        for `cache_ttl` seconds. Users updated or deleted through this object are evicted from the cache, but changes
+        made elsewhere are only seen once their entry expires, so caching is disabled by default.
+
         Args:
             firebase_app (optional): The firebase app object. Defaults to None.
             is_superuser_func: A function to determine whether the user is a superuser. Defaults to None.
+            pool_maxsize: The number of connections to keep open to Firebase. Defaults to None.
+            limiter: The capacity limiter bounding the worker threads. Defaults to None.
+            cache_ttl: How long to cache found users, in seconds. Defaults to 0.
+            cache_max: The maximum number of cached lookups. Defaults to 10000.
         """
         super().__init__()
         self._app = firebase_app
         self._is_superuser = is_superuser_func
+        self._limiter = limiter
+        self._inflight: InflightCalls[Tuple[str, str], Optional[FirebaseUser]] = InflightCalls()
+        self._cache: TTLCache[Tuple[str, str], FirebaseUser] = TTLCache(cache_max, cache_ttl)
+        # Bumped whenever users are evicted, so lookups started before are not cached.
+        self._generation = 0
+        if pool_maxsize is not None:
+            _resize_connection_pool(firebase_app, pool_maxsize)
 
     async def get(self, id: UID) -> Optional[FirebaseUser]:  # noqa: A002
         """Retrieve an user from firebase.
@@ -44,18 +97,80 @@ class FirebaseUserDatabase(BaseUserDatabase[FirebaseUser, UID]):
         Returns:
             The user object, or `None` if not found.
         """
+        key = ("uid", id)
+        user = self._cache.get(key)
+        if user is None:
+            user = await self._inflight.run(key, partial(self._get, id))
+        return user
+
+    async def _get(self, uid: UID) -> Optional[FirebaseUser]:
+        generation = self._generation
         try:
-            user = cast(
-                auth.UserRecord,
-                await to_thread.run_sync(auth.get_user, id, self._app),
-            )
+            user: auth.UserRecord = await self._run_sync(auth.get_user, uid, self._app)
         except auth.UserNotFoundError:
             return None
         else:
-            return self._map_user(user)
+            return self._remember(self._map_user(user), generation)
+
+    async def get_many(self, ids: Sequence[UID]) -> List[Optional[FirebaseUser]]:
+        """Retrieve many users from firebase.
+
+        Users are fetched in batches of up to 100, which takes a single call to Firebase per batch.
+
+        Args:
+            ids: The IDs of the users to retrieve
+
+        Returns:
+            A list with the user for each ID, in the same order, or `None` for each ID not found.
+        """
+        users = await self._get_users([auth.UidIdentifier(uid) for uid in ids])
+        by_id = {user.id: user for user in users}
+        return [by_id.get(uid) for uid in ids]
+
+    async def get_many_by_email(self, emails: Sequence[str]) -> List[Optional[FirebaseUser]]:
+        """Retrieve many users by email.
+
+        Users are fetched in batches of up to 100, which takes a single call to Firebase per batch.
+
+        Args:
+            emails: The emails to look up
+
+        Returns:
+            A list with the user for each email, in the same order, or `None` for each email not found.
+        """
+        users = await self._get_users([auth.EmailIdentifier(email) for email in emails])
+        by_email = {user.email.lower(): user for user in users}
+        return [by_email.get(email.lower()) for email in emails]
+
+    async def _get_users(self, identifiers: List[auth.UserIdentifier]) -> List[FirebaseUser]:
+        users: List[FirebaseUser] = []
+        for start in range(0, len(identifiers), _GET_USERS_BATCH_SIZE):
+            result = await self._run_sync(
+                auth.get_users,
+                identifiers[start : start + _GET_USERS_BATCH_SIZE],
+                self._app,
+            )
+            users.extend(self._map_user(user) for user in result.users)
+        return users
+
+    async def _run_sync(self, func: Callable[..., T], *args: Any) -> T:
+        return await to_thread.run_sync(func, *args, limiter=self._limiter)
 
     def _map_user(self, user: auth.UserRecord) -> FirebaseUser:
-        return FirebaseUser.from_record(user, self._app, self._is_superuser)
+        return FirebaseUser.from_record(user, is_superuser_func=self._is_superuser)
+
+    def user_from_claims(self, claims: Dict[str, Any]) -> FirebaseUser:
+        """Build an user from the claims of a verified ID token.
+
+        No call to Firebase is made, see `FirebaseUser.from_claims`.
+
+        Args:
+            claims: The decoded claims of a verified ID token
+
+        Returns:
+            The user object.
+        """
+        return FirebaseUser.from_claims(claims, is_superuser_func=self._is_superuser)
 
     async def get_by_email(self, email: str) -> Optional[FirebaseUser]:
         """Get an user by email.
@@ -68,8 +183,16 @@ class FirebaseUserDatabase(BaseUserDatabase[FirebaseUser, UID]):
         Returns:
             An user if the email was found, or `None`.
         """
+        key = ("email", email.lower())
+        user = self._cache.get(key)
+        if user is None:
+            user = await self._inflight.run(key, partial(self._get_by_email, email))
+        return user
+
+    async def _get_by_email(self, email: str) -> Optional[FirebaseUser]:
+        generation = self._generation
         try:
-            user = await to_thread.run_sync(
+            user = await self._run_sync(
                 auth.get_user_by_email,
                 email,
                 self._app,
@@ -77,7 +200,20 @@ class FirebaseUserDatabase(BaseUserDatabase[FirebaseUser, UID]):
         except auth.UserNotFoundError:
             return None
         else:
-            return self._map_user(user)
+            return self._remember(self._map_user(user), generation)
+
+    def _remember(self, user: FirebaseUser, generation: int) -> FirebaseUser:
+        # A user updated or deleted while it was being fetched may be stale.
+        if generation == self._generation:
+            self._cache.set(("uid", user.id), user)
+            if user.email:
+                self._cache.set(("email", user.email.lower()), user)
+        return user
+
+    def _forget(self, user: FirebaseUser) -> None:
+        self._generation += 1
+        self._cache.pop(("uid", user.id))
+        self._cache.pop(("email", user.email.lower()))
 
     async def delete(self, user: FirebaseUser) -> None:
         """Delete an user from the database.
@@ -93,7 +229,8 @@ class FirebaseUserDatabase(BaseUserDatabase[FirebaseUser, UID]):
             error_msg = f"Object {user!r} is not a valid user object."
             raise TypeError(error_msg)
 
-        await to_thread.run_sync(auth.delete_user, user.id)
+        await self._run_sync(auth.delete_user, user.id, self._app)
+        self._forget(user)
 
     async def create(self, create_dict: Dict[str, Any]) -> FirebaseUser:
         """Create a new user.
@@ -105,10 +242,10 @@ class FirebaseUserDatabase(BaseUserDatabase[FirebaseUser, UID]):
             A new `FirebaseUser` object
         """
         data = CreateFirebaseUserModel.model_validate(create_dict)
-        return self._map_user(await to_thread.run_sync(self._create, data))
+        return self._map_user(await self._run_sync(self._create, data))
 
     def _create(self, data: CreateFirebaseUserModel) -> auth.UserRecord:
-        return auth.create_user(app=self._app, **self._get_create_update_dict(data, exclude_none=True))
+        return auth.create_user(app=self._app, **self._get_create_update_dict(data))
 
     async def update(self, user: FirebaseUser, update_dict: Dict[str, Any]) -> FirebaseUser:
         """Perform an user update.
@@ -123,24 +260,91 @@ class FirebaseUserDatabase(BaseUserDatabase[FirebaseUser, UID]):
             The updated user object.
         """
         data = UpdateFirebaseUserModel.model_validate(update_dict)
-        return self._map_user(await to_thread.run_sync(self._update, str(user.id), data))
+        updated_user = self._map_user(await self._run_sync(self._update, str(user.id), data))
+        self._forget(user)
+        return self._remember(updated_user, self._generation)
 
     def _update(self, uid: str, data: UpdateFirebaseUserModel) -> auth.UserRecord:
         return auth.update_user(uid=uid, app=self._app, **self._get_create_update_dict(data))
 
-    def _get_create_update_dict(
-        self, data: Union[CreateFirebaseUserModel, UpdateFirebaseUserModel], *, exclude_none: bool = True
-    ) -> Dict[str, Any]:
-        return {
-            key: value if value is not None and not exclude_none else value
-            for key, value in {
-                "email": data.email,
-                "password": data.password,
-                "email_verified": data.is_verified,
-                "display_name": data.display_name,
-                "disabled": not data.is_active,
-                "phone_number": data.phone_number,
-                "photo_url": data.photo_url,
-                "custom_claims": data.custom_claims,
-            }.items()
-        }
+    def _get_create_update_dict(self, data: Union[CreateFirebaseUserModel, UpdateFirebaseUserModel]) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {}
+        fields_set = data.model_fields_set
+        for key, attr, convert in _FIELD_MAP:
+            if attr not in fields_set:
+                continue
+            value = getattr(data, attr)
+            if value is not None:
+                kwargs[key] = value if convert is None else convert(value)
+        return kwargs
+
+
+def get_user_database(
+    firebase_app: Optional[firebase_admin.App] = None,
+    is_superuser_func: Optional[IsSuperuser] = None,
+    pool_maxsize: Optional[int] = None,
+    limiter: Optional[CapacityLimiter] = None,
+    cache_ttl: float = 0,
+    cache_max: int = 10000,
+) -> FirebaseUserDatabase:
+    """Get a shared user database.
+
+    The same database object is returned for the same arguments, however they are passed, so it can be used to build a
+    user manager on every request without creating a new database each time:
+
+    ```python
+    async def get_user_manager():
+        yield FirebaseUserManager(get_user_database(firebase_app, cache_ttl=60))
+    ```
+
+    Databases are shared by app name. Once an app is deleted, its databases are dropped, and a new app initialized
+    under the same name gets new ones.
+
+    Args:
+        firebase_app (optional): The firebase app object. Defaults to None.
+        is_superuser_func: A function to determine whether the user is a superuser. Defaults to None.
+        pool_maxsize: The number of connections to keep open to Firebase. Defaults to None.
+        limiter: The capacity limiter bounding the worker threads. Defaults to None.
+        cache_ttl: How long to cache found users, in seconds. Defaults to 0.
+        cache_max: The maximum number of cached lookups. Defaults to 10000.
+
+    Returns:
+        The user database for the given arguments.
+    """
+    key = (
+        None if firebase_app is None else firebase_app.name,
+        is_superuser_func,
+        pool_maxsize,
+        limiter,
+        cache_ttl,
+        cache_max,
+    )
+    database = _user_databases.get(key)
+    if database is None or database._app is not firebase_app:
+        # Either a first call, or the app was deleted and a new one initialized under the same name.
+        _forget_deleted_apps()
+        database = _user_databases[key] = FirebaseUserDatabase(
+            firebase_app, is_superuser_func, pool_maxsize, limiter, cache_ttl, cache_max
+        )
+    return database
+
+
+def _forget_deleted_apps() -> None:
+    for key, database in list(_user_databases.items()):
+        app = database._app
+        if app is not None and not _is_current_app(app):
+            del _user_databases[key]
+
+
+def _is_current_app(app: firebase_admin.App) -> bool:
+    try:
+        return firebase_admin.get_app(app.name) is app
+    except ValueError:
+        return False
+
+
+def _resize_connection_pool(app: Optional[firebase_admin.App], pool_maxsize: int) -> None:
+    # Firebase Admin does not expose its HTTP session, so this relies on its internals.
+    session = auth._get_client(app)._user_manager.http_client.session
+    for prefix, adapter in list(session.adapters.items()):
+        session.mount(prefix, type(adapter)(pool_maxsize=pool_maxsize, max_retries=adapter.max_retries))
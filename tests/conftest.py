@@ -1,12 +1,60 @@
+from typing import AsyncIterator
+
 import pytest
 from phone_gen import PhoneNumber
 
 
-@pytest.fixture()
+@pytest.fixture(scope="session")
 def phone_gen() -> PhoneNumber:
     """Build a phone number generator.
 
+    The generator is only used to draw numbers, so it is built once per test session.
+
     Returns:
         A phone number generator object.
     """
     return PhoneNumber("us")
+
+
+@pytest.fixture(scope="session", params=["asyncio", "trio"])
+def anyio_backend(request: pytest.FixtureRequest) -> str:
+    """Select the backend async tests run on.
+
+    This overrides the module-scoped fixture from anyio, so that the test runner can be kept open across modules.
+
+    Args:
+        request: The fixture request, holding the backend name as parameter.
+
+    Returns:
+        The backend name.
+    """
+    return request.param
+
+
+@pytest.fixture(scope="session")
+async def _test_runner(anyio_backend: str) -> AsyncIterator[None]:
+    """Keep the anyio test runner open for the whole session.
+
+    Without an async fixture holding it, the runner and its event loop are created anew for every test. The backend
+    is a session parameter, so tests are grouped by backend and each one gets its own runner.
+
+    Args:
+        anyio_backend: The backend the runner is created for.
+
+    Yields:
+        Nothing, the fixture only holds the runner.
+    """
+    yield
+
+
+@pytest.fixture(autouse=True)
+def _use_test_runner(request: pytest.FixtureRequest) -> None:
+    """Make async tests use the shared test runner.
+
+    Sync tests do not request it, so they are not run once per backend.
+
+    Args:
+        request: The fixture request of the test.
+    """
+    if request.node.get_closest_marker("anyio") is not None:
+        request.getfixturevalue("_test_runner")
@@ -0,0 +1,90 @@
+from typing import Any, List
+from unittest.mock import sentinel
+
+import anyio
+import pytest
+
+from fastapi_users_firebase._cache import InflightCalls, TTLCache
+
+
+class TestTTLCache:
+    def test_evict_least_recently_used(self) -> None:
+        cache: TTLCache[str, Any] = TTLCache(2, 60)
+        cache.set("a", sentinel.a)
+        cache.set("b", sentinel.b)
+        assert cache.get("a") is sentinel.a
+        cache.set("c", sentinel.c)
+        assert cache.get("a") is sentinel.a
+        assert cache.get("b") is None
+        assert cache.get("c") is sentinel.c
+
+    def test_maxsize_zero(self) -> None:
+        cache: TTLCache[str, Any] = TTLCache(0, 60)
+        cache.set("a", sentinel.a)
+        assert cache.get("a") is None
+
+    def test_expired(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        now = 1000.0
+        monkeypatch.setattr("time.monotonic", lambda: now)
+        cache: TTLCache[str, Any] = TTLCache(10, 60)
+        cache.set("a", sentinel.a)
+        cache.set("b", sentinel.b, ttl=10)
+        now += 30
+        assert cache.get("a") is sentinel.a
+        assert cache.get("b") is None
+
+
+class TestInflightCalls:
+    @pytest.mark.anyio()
+    async def test_leader_error(self) -> None:
+        calls: InflightCalls[str, Any] = InflightCalls()
+        release = anyio.Event()
+        started: List[None] = []
+        errors: List[Exception] = []
+
+        async def fail() -> Any:
+            started.append(None)
+            await release.wait()
+            raise ValueError
+
+        async def run() -> None:
+            try:
+                await calls.run("key", fail)
+            except ValueError as exc:
+                errors.append(exc)
+
+        async with anyio.create_task_group() as tg:
+            for _ in range(3):
+                tg.start_soon(run)
+            await anyio.wait_all_tasks_blocked()
+            release.set()
+        assert len(started) == 1
+        assert len(errors) == 3
+        assert all(error is errors[0] for error in errors)
+
+    @pytest.mark.anyio()
+    async def test_leader_cancelled(self) -> None:
+        calls: InflightCalls[str, Any] = InflightCalls()
+        leader_scope = anyio.CancelScope()
+        results: List[Any] = []
+
+        async def hang() -> Any:
+            await anyio.sleep_forever()
+
+        async def value() -> Any:
+            return sentinel.value
+
+        async def lead() -> None:
+            with leader_scope:
+                await calls.run("key", hang)
+
+        async def wait() -> None:
+            results.append(await calls.run("key", value))
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(lead)
+            await anyio.wait_all_tasks_blocked()
+            tg.start_soon(wait)
+            await anyio.wait_all_tasks_blocked()
+            leader_scope.cancel()
+        assert results == [sentinel.value]
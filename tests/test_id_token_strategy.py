@@ -1,6 +1,9 @@
+import time
 from http import HTTPStatus
-from unittest.mock import Mock, create_autospec
+from typing import Iterator
+from unittest.mock import Mock, patch
 
+import anyio
 import firebase_admin
 import pytest
 from fastapi import HTTPException
@@ -9,6 +12,7 @@ from firebase_admin import auth
 from fastapi_users_firebase.id_token import FirebaseIdTokenStrategy
 from fastapi_users_firebase.manager import FirebaseUserManager
 from fastapi_users_firebase.user import FirebaseUser
+from fastapi_users_firebase.user_database import FirebaseUserDatabase
 
 
 @pytest.fixture()
@@ -18,7 +22,7 @@ def firebase_app() -> firebase_admin.App:
     Returns:
         A firebase app object mock.
     """
-    return create_autospec(firebase_admin.App)
+    return Mock(spec=firebase_admin.App)
 
 
 @pytest.fixture()
@@ -40,36 +44,43 @@ def strategy(firebase_app) -> FirebaseIdTokenStrategy:
 def manager() -> Mock:
     """Build and retrieve a mock object to be used as an user manager.
 
-    This is just a mock to be used as a parameter in some calls.
+    This is just a mock to be used as a parameter in some calls. It is specced from the class rather than autospecced,
+    which is much cheaper to build while still making the async methods awaitable.
 
     Returns:
         A mock object to be used as a manager.
     """
-    return create_autospec(FirebaseUserManager)
+    return Mock(spec=FirebaseUserManager)
+
+
+@pytest.fixture(scope="module")
+def _verify_patch() -> Iterator[Mock]:
+    with patch.object(auth, "verify_id_token", new_callable=Mock) as mock:
+        yield mock
 
 
 @pytest.fixture()
-def verify_mock(monkeypatch: pytest.MonkeyPatch):
+def verify_mock(_verify_patch: Mock) -> Mock:
     """The mock being called when calling `firebase_admin.auth.verify_id_token`.
 
-    This mock is set as an attribute in the firebase_admin.auth` module by monkeypatching it.
+    This mock is set as an attribute in the firebase_admin.auth` module once for the whole module, and reset for each
+    test.
 
     Args:
-        monkeypatch: The pytest monkeypatch object instance.
+        _verify_patch: The patched in mock.
 
     Returns:
         A mock object.
     """
-    mock = Mock()
-    monkeypatch.setattr(auth, auth.verify_id_token.__name__, mock)
-    return mock
+    _verify_patch.reset_mock(return_value=True, side_effect=True)
+    return _verify_patch
 
 
 class TestRead:
     @pytest.mark.anyio()
     async def test_read(self, strategy: FirebaseIdTokenStrategy, manager: Mock, verify_mock: Mock) -> None:
-        data = {"uid": "testuid"}
-        user = create_autospec(FirebaseUser)
+        data = {"uid": "testuid", "exp": time.time() + 3600}
+        user = Mock(spec=FirebaseUser)
         verify_mock.return_value = data
         manager.get.return_value = user
         result = await strategy.read_token("mytoken", manager)
@@ -77,6 +88,59 @@ class TestRead:
         verify_mock.assert_called_with("mytoken", strategy._app, True)
         manager.get.assert_called_with(manager.parse_id(data["uid"]))
 
+    @pytest.mark.anyio()
+    async def test_read_from_claims(
+        self, strategy: FirebaseIdTokenStrategy, manager: Mock, verify_mock: Mock, firebase_app
+    ) -> None:
+        manager.user_db = FirebaseUserDatabase(firebase_app)
+        verify_mock.return_value = {"uid": "testuid", "email": "test@example.com", "exp": time.time() + 3600}
+        result = await strategy.read_token("mytoken", manager)
+        assert result is not None
+        assert result.id == "testuid"
+        assert result.email == "test@example.com"
+        manager.get.assert_not_called()
+
+    @pytest.mark.anyio()
+    async def test_read_refresh_user(self, firebase_app, manager: Mock, verify_mock: Mock) -> None:
+        strategy = FirebaseIdTokenStrategy(firebase_app, refresh_user=True)
+        manager.user_db = FirebaseUserDatabase(firebase_app)
+        verify_mock.return_value = {"uid": "testuid", "exp": time.time() + 3600}
+        result = await strategy.read_token("mytoken", manager)
+        assert result is manager.get.return_value
+        manager.get.assert_called_with(manager.parse_id("testuid"))
+
+    @pytest.mark.anyio()
+    async def test_read_without_revocation_check(self, firebase_app, manager: Mock, verify_mock: Mock) -> None:
+        strategy = FirebaseIdTokenStrategy(firebase_app, check_revoked=False)
+        verify_mock.return_value = {"uid": "testuid", "exp": time.time() + 3600}
+        await strategy.read_token("mytoken", manager)
+        verify_mock.assert_called_once_with("mytoken", strategy._app, False)
+
+    @pytest.mark.anyio()
+    async def test_read_without_revocation_check_fetches_user(
+        self, firebase_app, manager: Mock, verify_mock: Mock
+    ) -> None:
+        strategy = FirebaseIdTokenStrategy(firebase_app, check_revoked=False)
+        manager.user_db = FirebaseUserDatabase(firebase_app)
+        verify_mock.return_value = {"uid": "testuid", "exp": time.time() + 3600}
+        result = await strategy.read_token("mytoken", manager)
+        assert result is manager.get.return_value
+        manager.get.assert_called_with(manager.parse_id("testuid"))
+
+    @pytest.mark.anyio()
+    async def test_read_limiter(self, firebase_app, manager: Mock, verify_mock: Mock) -> None:
+        limiter = anyio.CapacityLimiter(1)
+        strategy = FirebaseIdTokenStrategy(firebase_app, limiter=limiter)
+        borrowed = []
+
+        def verify(*args):
+            borrowed.append(limiter.borrowed_tokens)
+            return {"uid": "testuid", "exp": time.time() + 3600}
+
+        verify_mock.side_effect = verify
+        await strategy.read_token("mytoken", manager)
+        assert borrowed == [1]
+
     @pytest.mark.anyio()
     async def test_read_invalid(self, strategy: FirebaseIdTokenStrategy, manager: Mock, verify_mock: Mock) -> None:
         verify_mock.side_effect = auth.InvalidIdTokenError("Token is invalid")
@@ -107,3 +171,54 @@ class TestRead:
         result = await strategy.read_token(None, manager)
         assert result is None
         verify_mock.assert_not_called()
+
+    @pytest.mark.anyio()
+    async def test_read_cached(self, firebase_app, manager: Mock, verify_mock: Mock) -> None:
+        strategy = FirebaseIdTokenStrategy(firebase_app, cache_ttl=30)
+        verify_mock.return_value = {"uid": "testuid", "exp": time.time() + 3600}
+        await strategy.read_token("mytoken", manager)
+        await strategy.read_token("mytoken", manager)
+        verify_mock.assert_called_once_with("mytoken", strategy._app, True)
+        assert manager.get.call_count == 2
+
+    @pytest.mark.anyio()
+    async def test_read_cache_disabled(
+        self, strategy: FirebaseIdTokenStrategy, manager: Mock, verify_mock: Mock
+    ) -> None:
+        verify_mock.return_value = {"uid": "testuid", "exp": time.time() + 3600}
+        await strategy.read_token("mytoken", manager)
+        await strategy.read_token("mytoken", manager)
+        assert verify_mock.call_count == 2
+
+    @pytest.mark.anyio()
+    async def test_read_not_cached_past_expiration(self, firebase_app, manager: Mock, verify_mock: Mock) -> None:
+        strategy = FirebaseIdTokenStrategy(firebase_app, cache_ttl=30)
+        verify_mock.return_value = {"uid": "testuid", "exp": time.time() - 1}
+        await strategy.read_token("mytoken", manager)
+        await strategy.read_token("mytoken", manager)
+        assert verify_mock.call_count == 2
+
+    @pytest.mark.anyio()
+    async def test_read_concurrent(self, strategy: FirebaseIdTokenStrategy, manager: Mock, verify_mock: Mock) -> None:
+        def verify(*args):
+            time.sleep(0.05)
+            return {"uid": "testuid", "exp": time.time() + 3600}
+
+        verify_mock.side_effect = verify
+        async with anyio.create_task_group() as tg:
+            for _ in range(5):
+                tg.start_soon(strategy.read_token, "mytoken", manager)
+        verify_mock.assert_called_once_with("mytoken", strategy._app, True)
+        assert manager.get.call_count == 5
+
+
+class TestWarmup:
+    @pytest.mark.anyio()
+    async def test_warmup(self, strategy: FirebaseIdTokenStrategy, monkeypatch: pytest.MonkeyPatch) -> None:
+        client = Mock()
+        get_client_mock = Mock(return_value=client)
+        monkeypatch.setattr(auth, "_get_client", get_client_mock)
+        await strategy.warmup()
+        get_client_mock.assert_called_once_with(strategy._app)
+        verifier = client._token_verifier
+        verifier.request.assert_called_once_with(verifier.id_token_verifier.cert_url, method="GET")
@@ -1,32 +1,79 @@
-from typing import Any, cast
-from unittest.mock import Mock, create_autospec, sentinel
-
+import threading
+import time
+from contextlib import ExitStack
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, TypeVar, cast
+from unittest.mock import Mock, patch, sentinel
+
+import anyio
 import firebase_admin
 import pytest
+import requests
 from faker import Faker
-from firebase_admin import auth
+from firebase_admin import auth, credentials
 from phone_gen import PhoneNumber
+from requests.adapters import HTTPAdapter
 
-from fastapi_users_firebase import FirebaseUserDatabase
+from fastapi_users_firebase import FirebaseUserDatabase, get_user_database, user_database
 from fastapi_users_firebase.schemas import CreateFirebaseUserModel, UpdateFirebaseUserModel
 from fastapi_users_firebase.user import UID, FirebaseUser
 
+T = TypeVar("T")
 
-@pytest.fixture()
+_AUTH_FUNCTIONS = ("get_user", "get_user_by_email", "get_users", "delete_user", "create_user", "update_user")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def auth_mocks() -> Iterator[Dict[str, Mock]]:
+    """Replace the firebase auth functions with mocks.
+
+    The functions are patched once for the whole module, and the fixtures exposing each mock reset it for every test.
+
+    Yields:
+        The mocks, by function name.
+    """
+    with ExitStack() as stack:
+        yield {name: stack.enter_context(patch.object(auth, name, new_callable=Mock)) for name in _AUTH_FUNCTIONS}
+
+
+_GETTERS = [("get", "get_user", "pystr"), ("get_by_email", "get_user_by_email", "email")]
+
+
+async def _gather(*funcs: Callable[[], Awaitable[T]]) -> List[T]:
+    results: List[Any] = [None] * len(funcs)
+
+    async def run(index: int, func: Callable[[], Awaitable[T]]) -> None:
+        results[index] = await func()
+
+    async with anyio.create_task_group() as tg:
+        for index, func in enumerate(funcs):
+            tg.start_soon(run, index, func)
+    return results
+
+
+def _reset(mock: Mock) -> Mock:
+    mock.reset_mock(return_value=True, side_effect=True)
+    return mock
+
+
+@pytest.fixture(scope="module")
 def firebase_app() -> firebase_admin.App:
     """Build a mocked firebase app object.
 
+    The app is only compared by identity, so it is shared by the whole module.
+
     Returns:
         A firebase app mock.
     """
-    return create_autospec(firebase_admin.App)
+    return Mock(spec=firebase_admin.App)
 
 
-@pytest.fixture()
+@pytest.fixture(scope="module")
 def database(firebase_app: firebase_admin.App):
     """Builds a firebase user database.
 
-    This is a fixture function to build a test object.
+    This is a fixture function to build a test object. The database keeps no state between calls, since caching is
+    disabled by default, so it is shared by the whole module.
 
     Args:
         firebase_app: The app to assign to the database object
@@ -46,19 +93,37 @@ def user_spec() -> Mock:
     Returns:
         A mocked user record object
     """
-    return create_autospec(auth.UserRecord)
+    return Mock(spec=auth.UserRecord)
 
 
 @pytest.fixture()
-def is_superuser_mock() -> Mock:
-    """Build a mock for `is_superuser` property.
+def is_superuser_calls() -> List[auth.UserRecord]:
+    """Build the list recording the calls to `is_superuser_func`.
+
+    Returns:
+        An empty list.
+    """
+    return []
+
+
+@pytest.fixture()
+def is_superuser_func(is_superuser_calls: List[auth.UserRecord]) -> Callable[[auth.UserRecord], Any]:
+    """Build a callable for `is_superuser` property.
 
     The `FirebaseUser.is_superuser` property is backed by a callable. The callable accepts an user record object to check whether the user is a superuser or not.
 
+    Args:
+        is_superuser_calls: The list the received user records are appended to.
+
     Returns:
-        A callable mock object.
+        A callable returning `sentinel.is_super`.
     """
-    return Mock()
+
+    def is_superuser(record: auth.UserRecord) -> Any:
+        is_superuser_calls.append(record)
+        return sentinel.is_super
+
+    return is_superuser
 
 
 @pytest.fixture()
@@ -88,24 +153,35 @@ def user(faker: Faker, user_spec: Mock, phone_gen: PhoneNumber) -> FirebaseUser:
     )
 
 
+def _record(identifier: auth.UserIdentifier) -> Mock:
+    record = Mock(spec=auth.UserRecord)
+    if isinstance(identifier, auth.UidIdentifier):
+        record.uid = identifier.uid
+    elif isinstance(identifier, auth.EmailIdentifier):
+        record.email = (identifier.email or "").upper()
+    return record
+
+
 class TestFirebaseUserDatabase:
     @pytest.fixture()
-    def get_user_mock(self, monkeypatch: pytest.MonkeyPatch):
-        mock_obj = Mock()
-        monkeypatch.setattr(auth, auth.get_user.__name__, mock_obj)
-        return mock_obj
+    def get_user_mock(self, auth_mocks: Dict[str, Mock]) -> Mock:
+        return _reset(auth_mocks["get_user"])
+
+    @pytest.fixture()
+    def get_user_by_email_mock(self, auth_mocks: Dict[str, Mock]) -> Mock:
+        return _reset(auth_mocks["get_user_by_email"])
 
     @pytest.fixture()
-    def get_user_by_email_mock(self, monkeypatch: pytest.MonkeyPatch):
-        mock_obj = Mock()
-        monkeypatch.setattr(auth, auth.get_user_by_email.__name__, mock_obj)
+    def get_users_mock(self, auth_mocks: Dict[str, Mock]) -> Mock:
+        mock_obj = _reset(auth_mocks["get_users"])
+        mock_obj.side_effect = lambda identifiers, app: Mock(
+            spec=auth.GetUsersResult, users=[_record(identifier) for identifier in identifiers[::2]]
+        )
         return mock_obj
 
     @pytest.fixture()
-    def delete_user_mock(self, monkeypatch: pytest.MonkeyPatch) -> Mock:
-        mock = Mock()
-        monkeypatch.setattr(auth, auth.delete_user.__name__, mock)
-        return mock
+    def delete_user_mock(self, auth_mocks: Dict[str, Mock]) -> Mock:
+        return _reset(auth_mocks["delete_user"])
 
     @pytest.fixture()
     def create_model(self, faker: Faker, phone_gen: PhoneNumber) -> CreateFirebaseUserModel:
@@ -138,54 +214,220 @@ class TestFirebaseUserDatabase:
         )
 
     @pytest.fixture()
-    def create_mock(self, monkeypatch: pytest.MonkeyPatch) -> Mock:
-        mock = Mock()
-        monkeypatch.setattr(auth, auth.create_user.__name__, mock)
-        return mock
+    def create_mock(self, auth_mocks: Dict[str, Mock]) -> Mock:
+        return _reset(auth_mocks["create_user"])
 
     @pytest.fixture()
-    def update_mock(self, monkeypatch: pytest.MonkeyPatch) -> Mock:
-        mock = Mock()
-        monkeypatch.setattr(auth, auth.update_user.__name__, mock)
-        return mock
+    def update_mock(self, auth_mocks: Dict[str, Mock]) -> Mock:
+        return _reset(auth_mocks["update_user"])
 
     @pytest.mark.anyio()
-    async def test_get(self, faker: Faker, get_user_mock: Mock, database: FirebaseUserDatabase) -> None:
-        user_id = faker.pystr()
-        get_user_mock.return_value = sentinel
-        result = await database.get(user_id)
+    @pytest.mark.parametrize(("method_name", "auth_func_name", "provider"), _GETTERS)
+    async def test_get(
+        self,
+        firebase_app: firebase_admin.App,
+        method_name: str,
+        auth_func_name: str,
+        provider: str,
+        faker: Faker,
+        auth_mocks: Dict[str, Mock],
+        database: FirebaseUserDatabase,
+        user_spec: Mock,
+    ) -> None:
+        auth_func_mock = _reset(auth_mocks[auth_func_name])
+        value = getattr(faker, provider)()
+        auth_func_mock.return_value = user_spec
+        result = await getattr(database, method_name)(value)
         assert result is not None
-        assert result.record is sentinel
-        get_user_mock.assert_called_with(user_id, database._app)
+        assert result.record is user_spec
+        auth_func_mock.assert_called_with(value, firebase_app)
 
     @pytest.mark.anyio()
-    async def test_get_user_by_email(
-        self, get_user_by_email_mock: Mock, database: FirebaseUserDatabase, faker: Faker
+    @pytest.mark.parametrize(("method_name", "auth_func_name", "provider"), _GETTERS)
+    async def test_get_not_found(
+        self,
+        firebase_app: firebase_admin.App,
+        method_name: str,
+        auth_func_name: str,
+        provider: str,
+        faker: Faker,
+        auth_mocks: Dict[str, Mock],
+        database: FirebaseUserDatabase,
     ) -> None:
-        email = faker.email()
-        get_user_by_email_mock.return_value = sentinel
-        result = await database.get_by_email(email)
-        assert result is not None
-        assert result.record is sentinel
-        get_user_by_email_mock.assert_called_with(email, database._app)
+        auth_func_mock = _reset(auth_mocks[auth_func_name])
+        value = getattr(faker, provider)()
+        auth_func_mock.side_effect = auth.UserNotFoundError("User not found.")
+        result = await getattr(database, method_name)(value)
+        assert result is None
+        auth_func_mock.assert_called_with(value, firebase_app)
 
     @pytest.mark.anyio()
-    async def test_get_not_found(self, faker: Faker, get_user_mock: Mock, database: FirebaseUserDatabase) -> None:
-        user_id = faker.pystr()
+    @pytest.mark.parametrize(("method_name", "auth_func_name", "provider"), _GETTERS)
+    async def test_get_concurrent(
+        self,
+        firebase_app: firebase_admin.App,
+        method_name: str,
+        auth_func_name: str,
+        provider: str,
+        faker: Faker,
+        auth_mocks: Dict[str, Mock],
+        database: FirebaseUserDatabase,
+        user_spec: Mock,
+    ) -> None:
+        auth_func_mock = _reset(auth_mocks[auth_func_name])
+        value = getattr(faker, provider)()
+
+        def get_user(*args: Any) -> Any:
+            time.sleep(0.05)
+            return user_spec
+
+        auth_func_mock.side_effect = get_user
+        results = await _gather(*[partial(getattr(database, method_name), value)] * 5)
+        auth_func_mock.assert_called_once_with(value, firebase_app)
+        assert all(result is results[0] for result in results)
+
+    @pytest.fixture()
+    def cached_database(self, firebase_app: firebase_admin.App) -> FirebaseUserDatabase:
+        return FirebaseUserDatabase(firebase_app, cache_ttl=60)
+
+    @pytest.mark.anyio()
+    async def test_get_cached(
+        self,
+        firebase_app: firebase_admin.App,
+        get_user_mock: Mock,
+        get_user_by_email_mock: Mock,
+        cached_database: FirebaseUserDatabase,
+        user_spec: Mock,
+        faker: Faker,
+    ) -> None:
+        user_spec.uid = faker.pystr()
+        user_spec.email = faker.email()
+        get_user_mock.return_value = user_spec
+        result = await cached_database.get(user_spec.uid)
+        assert await cached_database.get(user_spec.uid) is result
+        assert await cached_database.get_by_email(user_spec.email.upper()) is result
+        get_user_mock.assert_called_once_with(user_spec.uid, firebase_app)
+        get_user_by_email_mock.assert_not_called()
+
+    @pytest.mark.anyio()
+    async def test_get_cached_not_found(
+        self, get_user_mock: Mock, cached_database: FirebaseUserDatabase, faker: Faker
+    ) -> None:
+        user_id = UID(faker.pystr())
         get_user_mock.side_effect = auth.UserNotFoundError("User not found.")
-        result = await database.get(user_id)
-        assert result is None
-        get_user_mock.assert_called_with(user_id, database._app)
+        assert await cached_database.get(user_id) is None
+        assert await cached_database.get(user_id) is None
+        assert get_user_mock.call_count == 2
 
     @pytest.mark.anyio()
-    async def test_get_user_by_email_not_found(
-        self, get_user_by_email_mock: Mock, database: FirebaseUserDatabase, faker: Faker
+    async def test_delete_evicts_cached(
+        self,
+        get_user_mock: Mock,
+        delete_user_mock: Mock,
+        cached_database: FirebaseUserDatabase,
+        user_spec: Mock,
+        faker: Faker,
     ) -> None:
-        email = faker.email()
-        get_user_by_email_mock.side_effect = auth.UserNotFoundError("User not found")
-        result = await database.get_by_email(email)
-        assert result is None
-        get_user_by_email_mock.assert_called_with(email, database._app)
+        user_spec.uid = faker.pystr()
+        user_spec.email = faker.email()
+        get_user_mock.return_value = user_spec
+        user = await cached_database.get(user_spec.uid)
+        assert user is not None
+        await cached_database.delete(user)
+        await cached_database.get(user_spec.uid)
+        assert get_user_mock.call_count == 2
+
+    @pytest.mark.anyio()
+    async def test_delete_during_get(
+        self,
+        get_user_mock: Mock,
+        delete_user_mock: Mock,
+        cached_database: FirebaseUserDatabase,
+        user_spec: Mock,
+        user: FirebaseUser,
+    ) -> None:
+        user_spec.uid = user.id
+        user_spec.email = user.email
+        release = threading.Event()
+
+        def get_user(*args: Any) -> Any:
+            release.wait()
+            return user_spec
+
+        get_user_mock.side_effect = get_user
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(cached_database.get, user.id)
+            await anyio.wait_all_tasks_blocked()
+            await cached_database.delete(user)
+            release.set()
+        get_user_mock.side_effect = None
+        get_user_mock.return_value = user_spec
+        await cached_database.get(user.id)
+        assert get_user_mock.call_count == 2
+
+    @pytest.mark.anyio()
+    async def test_get_limiter(
+        self, faker: Faker, get_user_mock: Mock, firebase_app: firebase_admin.App, user_spec: Mock
+    ) -> None:
+        limiter = anyio.CapacityLimiter(1)
+        database = FirebaseUserDatabase(firebase_app, limiter=limiter)
+        borrowed = []
+
+        def get_user(*args: Any) -> Any:
+            borrowed.append(limiter.borrowed_tokens)
+            return user_spec
+
+        get_user_mock.side_effect = get_user
+        await database.get(UID(faker.pystr()))
+        assert borrowed == [1]
+
+    def test_user_from_claims(
+        self,
+        firebase_app: firebase_admin.App,
+        is_superuser_func: Callable[[auth.UserRecord], Any],
+        is_superuser_calls: List[auth.UserRecord],
+        faker: Faker,
+    ) -> None:
+        database = FirebaseUserDatabase(firebase_app, is_superuser_func)
+        claims = {
+            "uid": faker.pystr(),
+            "email": faker.email(),
+            "email_verified": True,
+            "name": faker.name(),
+            "exp": 0,
+            "firebase": {"sign_in_provider": "password"},
+            "admin": True,
+        }
+        result = database.user_from_claims(claims)
+        assert result.id == claims["uid"]
+        assert result.email == claims["email"]
+        assert result.name == claims["name"]
+        assert result.is_verified
+        assert result.is_active
+        assert result.is_superuser is sentinel.is_super
+        assert result.record.custom_claims == {"admin": True}
+        assert is_superuser_calls == [result.record]
+
+    @pytest.mark.anyio()
+    async def test_get_many(self, get_users_mock: Mock, database: FirebaseUserDatabase, faker: Faker) -> None:
+        ids = [UID(faker.pystr()) for _ in range(150)]
+        result = await database.get_many(ids)
+        assert [user.id if user else None for user in result] == [
+            uid if index % 2 == 0 else None for index, uid in enumerate(ids)
+        ]
+        assert get_users_mock.call_count == 2
+
+    @pytest.mark.anyio()
+    async def test_get_many_by_email(self, get_users_mock: Mock, database: FirebaseUserDatabase, faker: Faker) -> None:
+        emails = [faker.email() for _ in range(3)]
+        result = await database.get_many_by_email(emails)
+        assert [user.email if user else None for user in result] == [emails[0].upper(), None, emails[2].upper()]
+        get_users_mock.assert_called_once()
+
+    @pytest.mark.anyio()
+    async def test_get_many_empty(self, get_users_mock: Mock, database: FirebaseUserDatabase) -> None:
+        assert await database.get_many([]) == []
+        get_users_mock.assert_not_called()
 
     @pytest.mark.anyio()
     async def test_delete_invalid(self, database: FirebaseUserDatabase, delete_user_mock: Mock) -> None:
@@ -203,7 +445,7 @@ class TestFirebaseUserDatabase:
         user: FirebaseUser,
     ) -> None:
         await database.delete(user)
-        delete_user_mock.assert_called_once_with(user.id)
+        delete_user_mock.assert_called_once_with(user.id, firebase_app)
 
     @pytest.mark.anyio()
     async def test_create(
@@ -213,11 +455,14 @@ class TestFirebaseUserDatabase:
         database: FirebaseUserDatabase,
         firebase_app: firebase_admin.App,
     ) -> None:
-        create_mock.return_value = create_autospec(auth.UserRecord)
+        create_mock.return_value = Mock(spec=auth.UserRecord)
         create_dict = create_model.model_dump(exclude_unset=True, mode="json")
         result = await database.create(create_dict)
         assert result.record == create_mock.return_value
-        create_mock.assert_called()
+        create_mock.assert_called_once()
+        kwargs = create_mock.call_args.kwargs
+        assert kwargs["photo_url"] == str(create_model.photo_url)
+        assert kwargs["disabled"] is not create_model.is_active
 
     @pytest.mark.anyio()
     async def test_update(
@@ -229,8 +474,115 @@ class TestFirebaseUserDatabase:
         firebase_app: firebase_admin.App,
         update_mock: Mock,
     ):
-        update_mock.return_value = create_autospec(auth.UserRecord)
+        update_mock.return_value = Mock(spec=auth.UserRecord)
         update_dict = update_model.model_dump(exclude_unset=True, mode="json")
         result = await database.update(user, update_dict)
         assert result.record == update_mock.return_value
         update_mock.assert_called()
+
+    @pytest.mark.anyio()
+    async def test_update_partial(
+        self,
+        firebase_app: firebase_admin.App,
+        database: FirebaseUserDatabase,
+        user: FirebaseUser,
+        update_mock: Mock,
+        faker: Faker,
+    ) -> None:
+        update_mock.return_value = Mock(spec=auth.UserRecord)
+        display_name = faker.name()
+        await database.update(user, {"display_name": display_name})
+        update_mock.assert_called_once_with(uid=user.id, app=firebase_app, display_name=display_name)
+
+    @pytest.mark.anyio()
+    @pytest.mark.parametrize("custom_claims", ({"admin": True}, '{"admin": true}'))
+    async def test_update_custom_claims(
+        self,
+        firebase_app: firebase_admin.App,
+        database: FirebaseUserDatabase,
+        user: FirebaseUser,
+        update_mock: Mock,
+        custom_claims: Any,
+    ) -> None:
+        update_mock.return_value = Mock(spec=auth.UserRecord)
+        await database.update(user, {"custom_claims": custom_claims})
+        update_mock.assert_called_once_with(uid=user.id, app=firebase_app, custom_claims={"admin": True})
+
+    def test_pool_maxsize(self, firebase_app: firebase_admin.App, monkeypatch: pytest.MonkeyPatch) -> None:
+        session = requests.Session()
+        adapter = session.get_adapter("https://")
+        assert isinstance(adapter, HTTPAdapter)
+        retries = adapter.max_retries
+        client = Mock()
+        client._user_manager.http_client.session = session
+        get_client_mock = Mock(return_value=client)
+        monkeypatch.setattr(auth, "_get_client", get_client_mock)
+        FirebaseUserDatabase(firebase_app, pool_maxsize=50)
+        get_client_mock.assert_called_once_with(firebase_app)
+        adapter = session.get_adapter("https://")
+        assert isinstance(adapter, HTTPAdapter)
+        assert adapter._pool_maxsize == 50
+        assert adapter.max_retries is retries
+
+    def test_get_user_database(
+        self, firebase_app: firebase_admin.App, is_superuser_func: Callable[[auth.UserRecord], Any]
+    ) -> None:
+        database = get_user_database(firebase_app, is_superuser_func)
+        assert database._app is firebase_app
+        assert database._is_superuser is is_superuser_func
+        assert get_user_database(firebase_app, is_superuser_func) is database
+        assert get_user_database(firebase_app) is not database
+
+    def test_get_user_database_spelling(self, firebase_app: firebase_admin.App) -> None:
+        database = get_user_database(firebase_app)
+        assert get_user_database(firebase_app, None) is database
+        assert get_user_database(firebase_app=firebase_app) is database
+        assert get_user_database(firebase_app, cache_ttl=0, cache_max=10000) is database
+
+    def test_get_user_database_deleted_app(self) -> None:
+        app = firebase_admin.initialize_app(Mock(spec=credentials.Base), name="deleted")
+        database = get_user_database(app)
+        assert get_user_database(app) is database
+        firebase_admin.delete_app(app)
+        app = firebase_admin.initialize_app(Mock(spec=credentials.Base), name="deleted")
+        try:
+            new_database = get_user_database(app)
+            assert new_database is not database
+            assert new_database._app is app
+            assert database not in user_database._user_databases.values()
+            assert get_user_database(app) is new_database
+        finally:
+            firebase_admin.delete_app(app)
+
+    def test_get_user_database_options(self, firebase_app: firebase_admin.App) -> None:
+        limiter = anyio.CapacityLimiter(5)
+        database = get_user_database(firebase_app, limiter=limiter, cache_ttl=60, cache_max=100)
+        assert database._limiter is limiter
+        assert database._cache.ttl == 60
+        assert database._cache.maxsize == 100
+        assert get_user_database(firebase_app, None, None, limiter, 60, 100) is database
+        assert get_user_database(firebase_app) is not database
+
+
+class TestFirebaseUser:
+    def test_to_dict(self, user: FirebaseUser) -> None:
+        assert user.to_dict() == {
+            "id": user.id,
+            "email": user.email,
+            "is_active": user.is_active,
+            "is_verified": user.is_verified,
+            "is_superuser": user.is_superuser,
+            "phone_number": user.phone_number,
+            "name": user.name,
+        }
+
+    def test_from_record_app_deprecated(self, firebase_app: firebase_admin.App, user_spec: Mock) -> None:
+        user_spec.disabled = False
+        with pytest.deprecated_call():
+            result = FirebaseUser.from_record(user_spec, firebase_app)
+        assert result.record is user_spec
+
+    def test_from_claims_app_deprecated(self, firebase_app: firebase_admin.App) -> None:
+        with pytest.deprecated_call():
+            result = FirebaseUser.from_claims({"uid": "testuid"}, firebase_app)
+        assert result.id == "testuid"